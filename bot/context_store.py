@@ -0,0 +1,139 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Set
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+
+from core.config import settings
+
+# ===== HELPER FUNCTIONS =====
+def _approx_size(obj: Any, depth: int = 4) -> int:
+    """Roughly estimates the memory used by `obj` and the containers inside it, in bytes."""
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        size += sum(_approx_size(k, depth - 1) + _approx_size(v, depth - 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_approx_size(item, depth - 1) for item in obj)
+    return size
+
+
+# ===== BOUNDED CONTEXT DATA STORE =====
+class ContextDataStore:
+    """
+    Keeps `context.user_data` and `context.chat_data` of an Application bounded.
+
+    The last activity of every user and chat is tracked in an LRU. Data of users and
+    chats idle for longer than `idle_ttl` seconds is dropped by a periodic sweep, and
+    the least recently active ones are dropped as soon as a size cap is exceeded.
+    """
+    def __init__(self, idle_ttl: float, max_users: int, max_chats: int, pinned_keys: Set[str] = frozenset()):
+        self.idle_ttl = idle_ttl
+        # Users whose user_data holds one of these keys are in the middle of a conversation
+        # and are never evicted for the size cap; the conversation timeout frees them instead.
+        self.pinned_keys = set(pinned_keys)
+        self.max_users = max_users
+        self.max_chats = max_chats
+        self.application: Application | None = None
+        self._users: "OrderedDict[int, float]" = OrderedDict()
+        self._chats: "OrderedDict[int, float]" = OrderedDict()
+        self.evicted_users = 0
+        self.evicted_chats = 0
+
+    def attach(self, application: Application):
+        self.application = application
+
+    @staticmethod
+    def _touch(seen: "OrderedDict[int, float]", key: int, now: float):
+        seen[key] = now
+        seen.move_to_end(key)
+
+    def _drop_user(self, user_id: int):
+        self._users.pop(user_id, None)
+        if self.application:
+            self.application.drop_user_data(user_id)
+        self.evicted_users += 1
+
+    def _drop_chat(self, chat_id: int):
+        self._chats.pop(chat_id, None)
+        if self.application:
+            self.application.drop_chat_data(chat_id)
+        self.evicted_chats += 1
+
+    def _is_pinned(self, user_id: int) -> bool:
+        if not self.application or not self.pinned_keys:
+            return False
+        user_data = self.application.user_data.get(user_id)
+        return bool(user_data) and not self.pinned_keys.isdisjoint(user_data)
+
+    def _evict_users_over_cap(self):
+        excess = len(self._users) - self.max_users
+        for user_id in list(self._users):
+            if excess <= 0:
+                break
+            if self._is_pinned(user_id):
+                continue
+            self._drop_user(user_id)
+            excess -= 1
+
+    def track(self, update: Update):
+        """Records activity for the update's user and chat, evicting the oldest entries over the cap."""
+        now = time.monotonic()
+        if update.effective_user:
+            self._touch(self._users, update.effective_user.id, now)
+            if len(self._users) > self.max_users:
+                self._evict_users_over_cap()
+        if update.effective_chat:
+            self._touch(self._chats, update.effective_chat.id, now)
+            while len(self._chats) > self.max_chats:
+                self._drop_chat(next(iter(self._chats)))
+
+    def sweep(self):
+        """Drops the data of every idle user and chat, except users pinned by an open conversation."""
+        expired_before = time.monotonic() - self.idle_ttl
+        for user_id, last_seen in list(self._users.items()):
+            if last_seen >= expired_before:
+                break
+            if self._is_pinned(user_id):
+                # Still in a conversation; its timeout decides when this data goes.
+                continue
+            self._drop_user(user_id)
+        while self._chats and next(iter(self._chats.values())) < expired_before:
+            self._drop_chat(next(iter(self._chats)))
+
+    def stats(self) -> Dict[str, int]:
+        user_data = self.application.user_data if self.application else {}
+        chat_data = self.application.chat_data if self.application else {}
+        return {
+            "tracked_users": len(self._users),
+            "tracked_chats": len(self._chats),
+            "user_data_entries": len(user_data),
+            "chat_data_entries": len(chat_data),
+            "user_data_bytes": _approx_size(dict(user_data)),
+            "chat_data_bytes": _approx_size(dict(chat_data)),
+            "evicted_users": self.evicted_users,
+            "evicted_chats": self.evicted_chats,
+        }
+
+
+# Create a single instance of the store to be used throughout the application
+context_store = ContextDataStore(
+    idle_ttl=settings.CONTEXT_DATA_IDLE_TTL_SECONDS,
+    max_users=settings.CONTEXT_DATA_MAX_USERS,
+    max_chats=settings.CONTEXT_DATA_MAX_CHATS,
+    pinned_keys={"new_panel"},
+)
+
+
+# ===== HANDLERS & JOBS =====
+async def track_context_activity(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs before every other handler to record user and chat activity."""
+    context_store.track(update)
+
+async def sweep_context_data(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Periodic job that frees the data of idle users and chats."""
+    context_store.sweep()
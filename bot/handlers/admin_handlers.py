@@ -1,4 +1,7 @@
 # ===== IMPORTS & DEPENDENCIES =====
+import asyncio
+import os
+import time
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.constants import ParseMode
 from telegram.ext import (
@@ -11,11 +14,17 @@ from telegram.ext import (
 )
 from sqlalchemy.orm import Session
 
+from bot.decorators import admin_required
 from bot.keyboards import get_panel_management_keyboard, get_admin_main_menu_keyboard
+from bot.rate_limiter import rate_limiter
+from bot.context_store import context_store
 from core.database import SessionLocal
-from crud import panel_crud
+from crud import panel_crud, user_crud, wallet_crud
+from core.config import settings
 from models.panel import PanelType
+from models.wallet import WalletEntryKind
 from services.panel_manager import get_panel_manager
+from services.exporter import EXPORTABLE_MODELS, EXPORT_FORMATS, export_table, upload_export_part
 
 # ===== CONVERSATION STATES =====
 (
@@ -28,6 +37,15 @@ from services.panel_manager import get_panel_manager
 
 
 # ===== HELPER FUNCTIONS for Conversation =====
+async def _end_expired_conversation(update: Update) -> int:
+    """Ends the add-panel conversation when its stored data is gone (e.g. freed from memory)."""
+    await update.message.reply_text(
+        "⌛️ اطلاعات فرآیند افزودن پنل منقضی شده است. لطفا دوباره از ابتدا شروع کنید.",
+        reply_markup=get_admin_main_menu_keyboard()
+    )
+    return ConversationHandler.END
+
+
 async def start_add_panel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
@@ -44,6 +62,9 @@ async def start_add_panel_conversation(update: Update, context: ContextTypes.DEF
 
 
 async def receive_panel_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'new_panel' not in context.user_data:
+        return await _end_expired_conversation(update)
+
     panel_name = update.message.text
     context.user_data['new_panel']['name'] = panel_name
 
@@ -58,6 +79,9 @@ async def receive_panel_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def receive_panel_type(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'new_panel' not in context.user_data:
+        return await _end_expired_conversation(update)
+
     panel_type_str = update.message.text
     try:
         panel_type = PanelType(panel_type_str)
@@ -75,6 +99,9 @@ async def receive_panel_type(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def receive_panel_url(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'new_panel' not in context.user_data:
+        return await _end_expired_conversation(update)
+
     context.user_data['new_panel']['api_url'] = update.message.text
     
     await update.message.reply_text(
@@ -85,6 +112,9 @@ async def receive_panel_url(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 
 async def receive_panel_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'new_panel' not in context.user_data:
+        return await _end_expired_conversation(update)
+
     context.user_data['new_panel']['username'] = update.message.text
     await update.message.reply_text(
         "نام کاربری ذخیره شد.\n\n"
@@ -94,6 +124,9 @@ async def receive_panel_username(update: Update, context: ContextTypes.DEFAULT_T
 
 
 async def receive_panel_password_and_validate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    if 'new_panel' not in context.user_data:
+        return await _end_expired_conversation(update)
+
     context.user_data['new_panel']['password'] = update.message.text
     panel_data = context.user_data['new_panel']
     
@@ -150,6 +183,186 @@ async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE
     return ConversationHandler.END
 
 
+async def conversation_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Called when an admin leaves the add-panel conversation unfinished; frees the collected data."""
+    if 'new_panel' in context.user_data:
+        del context.user_data['new_panel']
+    if update.effective_chat:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⌛️ زمان فرآیند افزودن پنل به پایان رسید و اطلاعات وارد شده حذف شد.",
+            reply_markup=get_admin_main_menu_keyboard()
+        )
+
+
+# ===== MEMORY STATS COMMAND =====
+@admin_required
+async def memory_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    stats = context_store.stats()
+    text = (
+        "🧠 **آمار حافظه ربات:**\n\n"
+        f"🔹 کاربران فعال در حافظه: {stats['tracked_users']}\n"
+        f"🔹 چت‌های فعال در حافظه: {stats['tracked_chats']}\n"
+        f"🔹 `user_data`: {stats['user_data_entries']} مورد (~{stats['user_data_bytes'] / 1024:.1f} KB)\n"
+        f"🔹 `chat_data`: {stats['chat_data_entries']} مورد (~{stats['chat_data_bytes'] / 1024:.1f} KB)\n"
+        f"🔹 کاربران حذف شده: {stats['evicted_users']}\n"
+        f"🔹 چت‌های حذف شده: {stats['evicted_chats']}"
+    )
+    await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+
+
+# ===== WALLET CREDIT COMMAND =====
+@admin_required
+async def credit_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    /credit <telegram_id> <amount> -> tops up a user's wallet
+    """
+    args = context.args or []
+    try:
+        telegram_id, amount = int(args[0]), int(args[1])
+    except (IndexError, ValueError):
+        await update.message.reply_text("استفاده: /credit <telegram_id> <amount>")
+        return
+    if amount <= 0:
+        await update.message.reply_text("مبلغ باید بزرگ‌تر از صفر باشد.")
+        return
+
+    db: Session = SessionLocal()
+    try:
+        db_user = user_crud.get_user_by_telegram_id(db, telegram_id=telegram_id)
+        if not db_user:
+            await update.message.reply_text("کاربری با این شناسه یافت نشد.")
+            return
+
+        # The update ID makes a redelivered webhook update credit the wallet only once.
+        wallet_crud.credit_wallet(
+            db,
+            user_id=db_user.id,
+            amount=amount,
+            kind=WalletEntryKind.TOPUP,
+            reference=f"admin:{update.update_id}",
+            description=f"Top-up by admin {update.effective_user.id}",
+        )
+        balance = wallet_crud.get_balance(db, user_id=db_user.id)
+    finally:
+        db.close()
+
+    await update.message.reply_text(
+        f"✅ مبلغ {amount:,} تومان به کیف پول کاربر {telegram_id} اضافه شد.\n"
+        f"موجودی جدید: {balance:,} تومان"
+    )
+
+
+# ===== EXPORT COMMAND =====
+def _log_progress_error(future) -> None:
+    if not future.cancelled() and future.exception():
+        print(f"Could not update export progress: {future.exception()}")
+
+@admin_required
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    /export <table> [csv|jsonl] -> sends the table as a gzip-compressed file
+    """
+    args = context.args or []
+    table = args[0] if args else None
+    fmt = args[1] if len(args) > 1 else "csv"
+    if table not in EXPORTABLE_MODELS or fmt not in EXPORT_FORMATS:
+        await update.message.reply_text(
+            f"استفاده: /export <{'|'.join(EXPORTABLE_MODELS)}> [{'|'.join(EXPORT_FORMATS)}]"
+        )
+        return
+
+    status_message = await update.message.reply_text(f"⏳ در حال آماده‌سازی خروجی '{table}'...")
+    loop = asyncio.get_running_loop()
+    last_report = 0.0
+
+    def report_progress(done: int, total: int):
+        # Called from the export thread; throttled so Telegram is not flooded with edits.
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < settings.EXPORT_PROGRESS_INTERVAL_SECONDS:
+            return
+        last_report = now
+        future = asyncio.run_coroutine_threadsafe(
+            status_message.edit_text(f"⏳ در حال آماده‌سازی خروجی '{table}'... ({done}/{total})"),
+            loop,
+        )
+        future.add_done_callback(_log_progress_error)
+
+    try:
+        path = await asyncio.to_thread(export_table, table, fmt, report_progress)
+    except Exception as e:
+        await status_message.edit_text(f"❌ خطایی در تهیه خروجی رخ داد: {e}")
+        return
+
+    filename = f"{table}.{fmt}.gz"
+    chat_id = update.effective_chat.id
+    try:
+        size = os.path.getsize(path)
+        part_size = settings.EXPORT_MAX_UPLOAD_BYTES
+        if size <= part_size:
+            await upload_export_part(chat_id, path, filename, offset=0, length=size)
+            await status_message.edit_text(f"✅ خروجی '{table}' ارسال شد.")
+        else:
+            # Telegram bots cannot upload files this large; send byte ranges that can be joined with `cat`.
+            part_count = -(-size // part_size)
+            for part in range(part_count):
+                offset = part * part_size
+                await upload_export_part(
+                    chat_id, path, f"{filename}.part{part + 1:02d}",
+                    offset=offset, length=min(part_size, size - offset),
+                )
+            await status_message.edit_text(
+                f"✅ خروجی '{table}' در {part_count} بخش ارسال شد.\n"
+                f"برای بازسازی فایل: cat {filename}.part* > {filename}"
+            )
+    except Exception as e:
+        print(f"An exception occurred while sending export '{table}': {e}")
+        await status_message.edit_text(f"❌ خطایی در ارسال خروجی رخ داد: {e}")
+    finally:
+        os.remove(path)
+
+
+# ===== RATE LIMIT COMMAND =====
+@admin_required
+async def rate_limit_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    /ratelimit                               -> shows the current limits
+    /ratelimit <action> <capacity> <refill>  -> changes the limit of an action ('user' for the per-user limit)
+    """
+    args = context.args or []
+    if len(args) == 3:
+        action = args[0]
+        try:
+            capacity, refill_per_second = float(args[1]), float(args[2])
+        except ValueError:
+            await update.message.reply_text("مقادیر ظرفیت و نرخ شارژ باید عدد باشند.")
+            return
+        if capacity < 1 or refill_per_second <= 0:
+            await update.message.reply_text("ظرفیت باید حداقل ۱ و نرخ شارژ بزرگ‌تر از صفر باشد.")
+            return
+
+        if action == "user":
+            rate_limiter.set_user_limit(capacity, refill_per_second)
+        else:
+            rate_limiter.set_action_limit(action, capacity, refill_per_second)
+        await update.message.reply_text(f"✅ محدودیت '{action}' به‌روزرسانی شد.")
+        return
+
+    if args:
+        await update.message.reply_text("استفاده: /ratelimit <action> <capacity> <refill_per_second>")
+        return
+
+    capacity, refill_per_second = rate_limiter.user_limit
+    text = "⏱ **محدودیت‌های درخواست:**\n\n"
+    text += f"🔹 `user`: ظرفیت {capacity:g}، شارژ {refill_per_second:g} در ثانیه\n"
+    for action, (capacity, refill_per_second) in rate_limiter.action_limits.items():
+        text += f"🔹 `{action}`: ظرفیت {capacity:g}، شارژ {refill_per_second:g} در ثانیه\n"
+    text += f"\nکاربران در حال پیگیری: {rate_limiter.tracked_users()}\n"
+    text += f"درخواست‌های رد شده: {rate_limiter.dropped}"
+    await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+
+
 # ===== MAIN ADMIN BUTTON HANDLER =====
 async def admin_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -1,12 +1,21 @@
 # ===== IMPORTS & DEPENDENCIES =====
+import html
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from sqlalchemy.orm import Session
 
+from core.config import settings
 from core.database import SessionLocal
-from crud import panel_crud
+from crud import panel_crud, purchase_job_crud, user_crud, wallet_crud
 from services.panel_manager import get_panel_manager
-from bot.keyboards import build_plans_keyboard, get_main_menu_keyboard
+from services.config_delivery import config_delivery
+from bot.keyboards import (
+    build_plans_keyboard,
+    build_services_keyboard,
+    get_main_menu_keyboard,
+    get_wallet_keyboard,
+)
 
 # ===== USER BUTTON HANDLER =====
 async def user_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -44,7 +53,7 @@ async def user_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
                 await query.edit_message_text("در حال حاضر هیچ پلن فعالی برای فروش یافت نشد.")
                 return
             
-            plans_keyboard = build_plans_keyboard(inbounds)
+            plans_keyboard = build_plans_keyboard(panel.id, inbounds)
             await query.edit_message_text(
                 "لطفا یکی از پلن‌های زیر را انتخاب کنید:",
                 reply_markup=plans_keyboard
@@ -54,11 +63,144 @@ async def user_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             db.close()
 
     elif data == "my_services":
-        await query.edit_message_text(text="شما گزینه 'سرویس‌های من' را انتخاب کردید. (در حال ساخت)")
+        db: Session = SessionLocal()
+        try:
+            db_user = user_crud.get_user_by_telegram_id(db, telegram_id=query.from_user.id)
+            services = purchase_job_crud.get_user_services(db, user_id=db_user.id) if db_user else []
+        finally:
+            db.close()
+
+        if not services:
+            await query.edit_message_text("شما هنوز هیچ سرویسی خریداری نکرده‌اید.", reply_markup=get_main_menu_keyboard())
+            return
+
+        await query.edit_message_text(
+            "لطفا سرویس مورد نظر خود را برای دریافت کانفیگ انتخاب کنید:",
+            reply_markup=build_services_keyboard(services)
+        )
+
+    elif data.startswith("service_"):
+        job_id = int(data.split("_")[-1])
+        db: Session = SessionLocal()
+        try:
+            db_user = user_crud.get_user_by_telegram_id(db, telegram_id=query.from_user.id)
+            service = db.get(purchase_job_crud.PurchaseJob, job_id)
+        finally:
+            db.close()
+
+        if not db_user or not service or service.user_id != db_user.id:
+            await query.edit_message_text("سرویس مورد نظر یافت نشد.", reply_markup=get_main_menu_keyboard())
+            return
+
+        if not service.config_link:
+            # The panel could not return the link when the service was created; try again now.
+            await query.edit_message_text("در حال دریافت کانفیگ از سرور...")
+            db: Session = SessionLocal()
+            try:
+                panel = db.get(panel_crud.V2RayPanel, service.panel_id)
+                manager = get_panel_manager(
+                    panel_type=panel.panel_type.value,
+                    api_url=panel.api_url,
+                    username=panel.username,
+                    password=panel.password
+                ) if panel else None
+
+                config_link = None
+                if manager:
+                    async with manager as m:
+                        config_link = await m.get_client_link(service.inbound_id, service.client_uuid, service.client_email)
+                if config_link:
+                    service = purchase_job_crud.set_config_link(db, job_id=service.id, config_link=config_link)
+            finally:
+                db.close()
+
+            if not service.config_link:
+                await query.edit_message_text("کانفیگ این سرویس در دسترس نیست. لطفا بعدا دوباره تلاش کنید.")
+                return
+
+        await config_delivery.send_config(
+            context.bot,
+            chat_id=query.message.chat_id,
+            link=service.config_link,
+            caption=f"🔑 {html.escape(service.client_email)}\n\n<code>{html.escape(service.config_link)}</code>",
+            parse_mode=ParseMode.HTML,
+        )
     
+    elif data == "wallet":
+        db: Session = SessionLocal()
+        try:
+            db_user = user_crud.get_user_by_telegram_id(db, telegram_id=query.from_user.id)
+            if not db_user:
+                await query.edit_message_text("ابتدا با دستور /start در ربات ثبت‌نام کنید.")
+                return
+
+            balance = wallet_crud.get_balance(db, user_id=db_user.id)
+            entries = wallet_crud.get_wallet_entries(db, user_id=db_user.id, limit=5)
+
+            text = f"💰 **موجودی کیف پول شما:** `{balance:,}` تومان\n"
+            if entries:
+                text += "\n🧾 **آخرین تراکنش‌ها:**\n"
+                for entry in entries:
+                    sign = "➕" if entry.amount > 0 else "➖"
+                    text += f"{sign} `{abs(entry.amount):,}` تومان ({entry.kind.value})\n"
+
+            await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=get_wallet_keyboard())
+        finally:
+            db.close()
+
     elif data.startswith("select_plan_"):
-        plan_id = data.split("_")[-1]
-        await query.edit_message_text(f"شما پلن با شناسه {plan_id} را انتخاب کردید.\n\n(مرحله پرداخت و ساخت کانفیگ در حال ساخت است)")
+        # Only enqueue here; payment and provisioning happen in the purchase workers.
+        if not settings.PLAN_PRICE or settings.PLAN_PRICE <= 0:
+            print("⚠️ PLAN_PRICE is not configured; refusing to enqueue a purchase.")
+            await query.edit_message_text("متاسفانه در حال حاضر امکان خرید وجود ندارد. لطفا بعدا تلاش کنید.")
+            return
+
+        try:
+            panel_id, inbound_id = (int(part) for part in data[len("select_plan_"):].split("_"))
+        except ValueError:
+            # Buttons sent before plans carried a panel ID cannot be mapped to an order.
+            await query.edit_message_text(
+                "این لیست پلن‌ها منقضی شده است. لطفا دوباره از منوی خرید سرویس اقدام کنید.",
+                reply_markup=get_main_menu_keyboard()
+            )
+            return
+
+        db: Session = SessionLocal()
+        try:
+            db_user = user_crud.get_user_by_telegram_id(db, telegram_id=query.from_user.id)
+            if not db_user:
+                await query.edit_message_text("ابتدا با دستور /start در ربات ثبت‌نام کنید.")
+                return
+
+            # Tapping the same plan button again maps to the same key, so it cannot create a second order.
+            idempotency_key = f"{query.message.chat_id}:{query.message.message_id}:{panel_id}:{inbound_id}"
+            job, created = purchase_job_crud.enqueue_purchase_job(
+                db,
+                idempotency_key=idempotency_key,
+                user_id=db_user.id,
+                panel_id=panel_id,
+                inbound_id=inbound_id,
+                price=settings.PLAN_PRICE,
+                chat_id=query.message.chat_id,
+                status_message_id=query.message.message_id,
+            )
+        finally:
+            db.close()
+
+        if not job:
+            await query.edit_message_text(
+                "❌ خطایی در ثبت سفارش رخ داد. لطفا دوباره تلاش کنید.",
+                reply_markup=get_main_menu_keyboard()
+            )
+            return
+
+        if created:
+            await query.edit_message_text(
+                f"🧾 سفارش شما با شماره {job.id} ثبت شد.\n\n"
+                "⏳ در حال ساخت سرویس... نتیجه در همین پیام به شما اطلاع داده می‌شود."
+            )
+        else:
+            print(f"Duplicate purchase request for job {job.id} ignored.")
 
     elif data == "start_menu":
         # This brings the user back to the main menu
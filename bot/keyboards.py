@@ -15,20 +15,37 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     ]
     return InlineKeyboardMarkup(keyboard)
 
-def build_plans_keyboard(inbounds: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
+def build_plans_keyboard(panel_id: int, inbounds: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
     """Dynamically builds a keyboard for service plans from inbounds."""
     keyboard = []
     for inbound in inbounds:
         # 'remark' is the plan name in x-ui panels
         plan_name = inbound.get("remark", f"پلن {inbound.get('id')}")
-        # We create a callback_data like 'select_plan_1' where 1 is the inbound ID
-        callback_data = f"select_plan_{inbound.get('id')}"
+        # We create a callback_data like 'select_plan_2_1' where 2 is the panel ID and 1 is the inbound ID
+        callback_data = f"select_plan_{panel_id}_{inbound.get('id')}"
         keyboard.append([InlineKeyboardButton(f"🚀 {plan_name}", callback_data=callback_data)])
     
     # Add a back button to return to the main menu
     keyboard.append([InlineKeyboardButton("⬅️ بازگشت به منوی اصلی", callback_data="start_menu")])
     return InlineKeyboardMarkup(keyboard)
 
+def build_services_keyboard(services: List[Any]) -> InlineKeyboardMarkup:
+    """Builds a keyboard with one button per purchased service."""
+    keyboard = []
+    for service in services:
+        # We create a callback_data like 'service_5' where 5 is the purchase job ID
+        keyboard.append([InlineKeyboardButton(f"🔑 {service.client_email}", callback_data=f"service_{service.id}")])
+
+    keyboard.append([InlineKeyboardButton("⬅️ بازگشت به منوی اصلی", callback_data="start_menu")])
+    return InlineKeyboardMarkup(keyboard)
+
+def get_wallet_keyboard() -> InlineKeyboardMarkup:
+    """Returns the keyboard shown under the wallet balance."""
+    keyboard = [
+        [InlineKeyboardButton("⬅️ بازگشت به منوی اصلی", callback_data="start_menu")],
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
 
 # ===== ADMIN KEYBOARDS =====
 def get_admin_main_menu_keyboard() -> InlineKeyboardMarkup:
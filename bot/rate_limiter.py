@@ -0,0 +1,180 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from core.config import settings
+from core.database import SessionLocal
+from crud import user_crud
+
+# ===== TOKEN BUCKET RATE LIMITER =====
+class RateLimiter:
+    """
+    An in-memory, per-user token bucket limiter.
+
+    Every user has one bucket for all of their updates, plus one bucket for each
+    action that has its own limit (e.g. "buy_service"). Buckets are kept in an LRU
+    that holds at most `max_users` users; users idle for longer than `idle_ttl`
+    seconds are evicted first, so memory stays bounded.
+    """
+    def __init__(self, user_limit: Tuple[float, float], action_limits: Dict[str, Tuple[float, float]],
+                 max_users: int, idle_ttl: float):
+        # Limits are (capacity, refill tokens per second).
+        self.user_limit = user_limit
+        self.action_limits = dict(action_limits)
+        self.max_users = max_users
+        self.idle_ttl = idle_ttl
+        self.exempt_user_ids: Set[int] = set()
+        self.dropped = 0
+        # user_id -> {bucket_name: [tokens, last_refill]}
+        self._buckets: "OrderedDict[int, Dict[str, list]]" = OrderedDict()
+        self._last_seen: Dict[int, float] = {}
+
+    def set_action_limit(self, action: str, capacity: float, refill_per_second: float):
+        self.action_limits[action] = (capacity, refill_per_second)
+        # Existing buckets keep their old capacity; start them over with the new one.
+        for buckets in self._buckets.values():
+            buckets.pop(action, None)
+
+    def set_user_limit(self, capacity: float, refill_per_second: float):
+        self.user_limit = (capacity, refill_per_second)
+        for buckets in self._buckets.values():
+            buckets.pop("*", None)
+
+    def tracked_users(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float):
+        while self._buckets:
+            oldest_user_id = next(iter(self._buckets))
+            idle = now - self._last_seen[oldest_user_id]
+            if len(self._buckets) <= self.max_users and idle < self.idle_ttl:
+                break
+            del self._buckets[oldest_user_id]
+            del self._last_seen[oldest_user_id]
+
+    @staticmethod
+    def _refill(buckets: Dict[str, list], name: str, limit: Tuple[float, float], now: float) -> list:
+        capacity, refill_per_second = limit
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = [capacity, now]
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill_per_second)
+        bucket[1] = now
+        return bucket
+
+    def allow(self, user_id: int, action: Optional[str] = None) -> bool:
+        """
+        Returns True if the update may be handled.
+        A token is taken from every relevant bucket only when all of them have one,
+        so a denied action does not also use up the user's general allowance.
+        """
+        if user_id in self.exempt_user_ids:
+            return True
+
+        now = time.monotonic()
+        buckets = self._buckets.get(user_id)
+        if buckets is None:
+            buckets = self._buckets[user_id] = {}
+        else:
+            self._buckets.move_to_end(user_id)
+        self._last_seen[user_id] = now
+        self._evict(now)
+
+        relevant = [self._refill(buckets, "*", self.user_limit, now)]
+        if action in self.action_limits:
+            relevant.append(self._refill(buckets, action, self.action_limits[action], now))
+
+        if any(bucket[0] < 1 for bucket in relevant):
+            self.dropped += 1
+            return False
+        for bucket in relevant:
+            bucket[0] -= 1
+        return True
+
+
+# ===== HELPER FUNCTIONS =====
+# user_id -> (is_admin, expires_at); only users who hit a limit are looked up.
+_admin_cache: "OrderedDict[int, Tuple[bool, float]]" = OrderedDict()
+_ADMIN_CACHE_MAX_ITEMS = 1024
+
+def _lookup_admin(user_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        return user_crud.is_user_admin(db, telegram_id=user_id)
+    finally:
+        db.close()
+
+async def is_admin_cached(user_id: int) -> bool:
+    """Checks the admin flag in the database, caching the answer for RATE_LIMIT_ADMIN_CACHE_SECONDS."""
+    now = time.monotonic()
+    cached = _admin_cache.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    try:
+        is_admin = await asyncio.to_thread(_lookup_admin, user_id)
+    except Exception as e:
+        # Fail closed: without the database a limited user stays limited.
+        print(f"An exception occurred while checking admin status of {user_id}: {e}")
+        return False
+    _admin_cache[user_id] = (is_admin, now + settings.RATE_LIMIT_ADMIN_CACHE_SECONDS)
+    _admin_cache.move_to_end(user_id)
+    while len(_admin_cache) > _ADMIN_CACHE_MAX_ITEMS:
+        _admin_cache.popitem(last=False)
+    return is_admin
+
+def get_update_action(update: Update) -> Optional[str]:
+    """
+    Returns the action an update triggers, e.g. 'buy_service' or '/start'.
+    IDs at the end of callback data are stripped, so 'select_plan_2_1' becomes 'select_plan'.
+    """
+    if update.callback_query and update.callback_query.data:
+        return re.sub(r"(_\d+)+$", "", update.callback_query.data)
+    if update.message and update.message.text and update.message.text.startswith("/"):
+        return update.message.text.split()[0].split("@")[0]
+    return None
+
+
+# Create a single instance of the limiter to be used throughout the application
+rate_limiter = RateLimiter(
+    user_limit=(settings.RATE_LIMIT_USER_CAPACITY, settings.RATE_LIMIT_USER_REFILL_PER_SECOND),
+    action_limits={
+        "buy_service": (settings.RATE_LIMIT_BUY_CAPACITY, settings.RATE_LIMIT_BUY_REFILL_PER_SECOND),
+        "select_plan": (settings.RATE_LIMIT_BUY_CAPACITY, settings.RATE_LIMIT_BUY_REFILL_PER_SECOND),
+    },
+    max_users=settings.RATE_LIMIT_MAX_TRACKED_USERS,
+    idle_ttl=settings.RATE_LIMIT_IDLE_TTL_SECONDS,
+)
+rate_limiter.exempt_user_ids.add(settings.ADMIN_USER_ID)
+
+
+# ===== RATE LIMIT HANDLER =====
+async def rate_limit_guard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Runs before all other handlers and stops updates from users who are over their limit,
+    before any database or panel work is done.
+    """
+    user = update.effective_user
+    if not user:
+        return
+
+    if rate_limiter.allow(user.id, get_update_action(update)):
+        return
+
+    # Admins are exempt; checked only for rejected updates so normal traffic never touches the DB.
+    if await is_admin_cached(user.id):
+        return
+
+    if update.callback_query:
+        # Answer the query so the button stops loading, without running its handler.
+        try:
+            await update.callback_query.answer("⏳ لطفا کمی صبر کنید و دوباره تلاش کنید.")
+        except Exception:
+            pass
+    raise ApplicationHandlerStop
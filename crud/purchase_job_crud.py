@@ -0,0 +1,131 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import datetime
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.purchase_job import PurchaseJob, PurchaseJobStatus
+
+# ===== CRUD FUNCTIONS FOR PURCHASE JOB =====
+def get_job_by_idempotency_key(db: Session, idempotency_key: str) -> PurchaseJob | None:
+    return db.query(PurchaseJob).filter(PurchaseJob.idempotency_key == idempotency_key).first()
+
+def enqueue_purchase_job(db: Session, idempotency_key: str, user_id: int, panel_id: int, inbound_id: int,
+                         price: int, chat_id: int, status_message_id: int | None = None) -> tuple[PurchaseJob | None, bool]:
+    """
+    Adds a purchase job to the queue.
+    Returns (job, created); if a job with the same idempotency key exists, it is returned with created=False.
+    """
+    if price <= 0:
+        raise ValueError("Purchase price must be positive.")
+
+    existing = get_job_by_idempotency_key(db, idempotency_key)
+    if existing:
+        return existing, False
+
+    job = PurchaseJob(
+        idempotency_key=idempotency_key,
+        user_id=user_id,
+        panel_id=panel_id,
+        inbound_id=inbound_id,
+        price=price,
+        chat_id=chat_id,
+        status_message_id=status_message_id,
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request enqueued the same key between our check and insert,
+        # or the panel/user no longer exists (in which case no job is returned).
+        db.rollback()
+        return get_job_by_idempotency_key(db, idempotency_key), False
+    db.refresh(job)
+    return job, True
+
+def claim_next_job(db: Session, panel_id: int) -> PurchaseJob | None:
+    """
+    Atomically takes the next due job for a panel and marks it as running.
+    `SKIP LOCKED` lets many workers poll the same table without blocking each other.
+    Running jobs whose lease has expired (e.g. the worker crashed) are claimed again.
+    """
+    now = datetime.datetime.utcnow()
+    lease_expired_before = now - datetime.timedelta(seconds=settings.PURCHASE_JOB_LEASE_SECONDS)
+
+    job = (
+        db.query(PurchaseJob)
+        .filter(
+            PurchaseJob.panel_id == panel_id,
+            or_(
+                (PurchaseJob.status == PurchaseJobStatus.PENDING) & (PurchaseJob.next_run_at <= now),
+                (PurchaseJob.status == PurchaseJobStatus.RUNNING) & (PurchaseJob.locked_at < lease_expired_before),
+            ),
+        )
+        .order_by(PurchaseJob.next_run_at)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if not job:
+        db.rollback()
+        return None
+
+    job.status = PurchaseJobStatus.RUNNING
+    job.locked_at = now
+    job.attempts += 1
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_user_services(db: Session, user_id: int) -> list[PurchaseJob]:
+    """
+    Returns the successfully provisioned purchases of a user, newest first.
+    """
+    return (
+        db.query(PurchaseJob)
+        .filter(PurchaseJob.user_id == user_id, PurchaseJob.status == PurchaseJobStatus.SUCCEEDED)
+        .order_by(PurchaseJob.id.desc())
+        .all()
+    )
+
+def mark_job_succeeded(db: Session, job: PurchaseJob, client_uuid: str, client_email: str,
+                       config_link: str | None = None) -> PurchaseJob:
+    job.status = PurchaseJobStatus.SUCCEEDED
+    job.client_uuid = client_uuid
+    job.client_email = client_email
+    job.config_link = config_link
+    job.locked_at = None
+    job.last_error = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+def set_config_link(db: Session, job_id: int, config_link: str) -> PurchaseJob:
+    """
+    Stores a config link fetched after the job succeeded.
+    """
+    job = db.get(PurchaseJob, job_id)
+    job.config_link = config_link
+    db.commit()
+    db.refresh(job)
+    return job
+
+def mark_job_failed(db: Session, job: PurchaseJob, error: str, retry: bool = True) -> PurchaseJob:
+    """
+    Records a failed attempt. The job is rescheduled with exponential backoff
+    unless `retry` is False or it has used all of its attempts.
+    """
+    job.last_error = error
+    job.locked_at = None
+    if retry and job.attempts < settings.PURCHASE_JOB_MAX_ATTEMPTS:
+        delay = min(
+            settings.PURCHASE_JOB_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1)),
+            settings.PURCHASE_JOB_RETRY_MAX_SECONDS,
+        )
+        job.status = PurchaseJobStatus.PENDING
+        job.next_run_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+    else:
+        job.status = PurchaseJobStatus.FAILED
+    db.commit()
+    db.refresh(job)
+    return job
@@ -0,0 +1,170 @@
+# ===== IMPORTS & DEPENDENCIES =====
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from models.user import User
+from models.wallet import WalletEntry, WalletEntryKind, WalletSnapshot
+
+# ===== HELPER FUNCTIONS =====
+def _lock_wallet(db: Session, user_id: int) -> None:
+    """
+    Serializes ledger writes for a single user until the transaction ends.
+    `FOR NO KEY UPDATE` locks only this user's row, so writes for different
+    users never wait on each other, and the users row itself is not modified.
+    """
+    locked = db.query(User.id).filter(User.id == user_id).with_for_update(key_share=True).first()
+    if locked is None:
+        raise ValueError(f"User with id {user_id} does not exist.")
+
+def _compute_balance(db: Session, user_id: int) -> tuple[int, int, int]:
+    """
+    Returns (balance, entries_since_snapshot, last_entry_id) for a user.
+    Only the entries written after the latest snapshot are scanned.
+    """
+    snapshot = db.get(WalletSnapshot, user_id, populate_existing=True)
+    base_balance = snapshot.balance if snapshot else 0
+    last_entry_id = snapshot.last_entry_id if snapshot else 0
+
+    pending_sum, pending_count, max_entry_id = (
+        db.query(
+            func.coalesce(func.sum(WalletEntry.amount), 0),
+            func.count(WalletEntry.id),
+            func.max(WalletEntry.id),
+        )
+        .filter(WalletEntry.user_id == user_id, WalletEntry.id > last_entry_id)
+        .one()
+    )
+    return base_balance + int(pending_sum), pending_count, max_entry_id or last_entry_id
+
+def _write_snapshot(db: Session, user_id: int, balance: int, last_entry_id: int) -> WalletSnapshot:
+    snapshot = db.get(WalletSnapshot, user_id)
+    if snapshot is None:
+        snapshot = WalletSnapshot(user_id=user_id)
+        db.add(snapshot)
+    snapshot.balance = balance
+    snapshot.last_entry_id = last_entry_id
+    return snapshot
+
+def _append_entry(db: Session, user_id: int, amount: int, kind: WalletEntryKind,
+                  reference: str | None, description: str | None) -> WalletEntry:
+    """
+    Inserts a ledger entry for a user whose wallet is already locked, and
+    refreshes the snapshot once enough entries have accumulated behind it.
+    """
+    entry = WalletEntry(
+        user_id=user_id,
+        amount=amount,
+        kind=kind,
+        reference=reference,
+        description=description,
+    )
+    db.add(entry)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Another user's wallet used the same reference concurrently (it holds a different row lock).
+        db.rollback()
+        existing = get_entry_by_reference(db, reference)
+        if existing is None:
+            raise
+        return _check_existing_entry(existing, user_id, amount)
+
+    balance, pending_count, last_entry_id = _compute_balance(db, user_id)
+    if pending_count >= settings.WALLET_SNAPSHOT_INTERVAL:
+        _write_snapshot(db, user_id, balance, last_entry_id)
+
+    db.commit()
+    db.refresh(entry)
+    return entry
+
+def _check_existing_entry(existing: WalletEntry, user_id: int, amount: int) -> WalletEntry:
+    """
+    Returns an entry found by its idempotency key if it records the same operation,
+    i.e. the same user and the same signed amount; otherwise the key was reused by mistake.
+    """
+    if existing.user_id != user_id or existing.amount != amount:
+        raise ValueError(f"Reference '{existing.reference}' is already used by a different wallet entry.")
+    return existing
+
+# ===== CRUD FUNCTIONS FOR WALLET =====
+def get_balance(db: Session, user_id: int) -> int:
+    """
+    Returns the current balance of a user's wallet.
+    """
+    balance, _, _ = _compute_balance(db, user_id)
+    return balance
+
+def get_entry_by_reference(db: Session, reference: str | None) -> WalletEntry | None:
+    """
+    Returns the ledger entry recorded with the given idempotency key, if any.
+    """
+    if reference is None:
+        return None
+    return db.query(WalletEntry).filter(WalletEntry.reference == reference).first()
+
+def get_wallet_entries(db: Session, user_id: int, limit: int = 10) -> list[WalletEntry]:
+    """
+    Returns the most recent ledger entries of a user, newest first.
+    """
+    return (
+        db.query(WalletEntry)
+        .filter(WalletEntry.user_id == user_id)
+        .order_by(WalletEntry.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+def credit_wallet(db: Session, user_id: int, amount: int, kind: WalletEntryKind = WalletEntryKind.TOPUP,
+                  reference: str | None = None, description: str | None = None) -> WalletEntry:
+    """
+    Adds money to a user's wallet.
+    If an entry with the same `reference` already exists for the same credit, it is returned instead;
+    a `reference` already used by a different entry raises ValueError.
+    """
+    if amount <= 0:
+        raise ValueError("Credit amount must be positive.")
+
+    _lock_wallet(db, user_id)
+    existing = get_entry_by_reference(db, reference)
+    if existing:
+        db.rollback()
+        return _check_existing_entry(existing, user_id, amount)
+
+    return _append_entry(db, user_id, amount, kind, reference, description)
+
+def debit_wallet(db: Session, user_id: int, amount: int, kind: WalletEntryKind = WalletEntryKind.PURCHASE,
+                 reference: str | None = None, description: str | None = None) -> WalletEntry | None:
+    """
+    Takes money from a user's wallet if, and only if, the balance covers it.
+    Returns None when the balance is insufficient, so concurrent purchases can never overdraw.
+    If an entry with the same `reference` already exists for the same debit, it is returned instead;
+    a `reference` already used by a different entry raises ValueError.
+    """
+    if amount <= 0:
+        raise ValueError("Debit amount must be positive.")
+
+    _lock_wallet(db, user_id)
+    existing = get_entry_by_reference(db, reference)
+    if existing:
+        db.rollback()
+        return _check_existing_entry(existing, user_id, -amount)
+
+    balance, _, _ = _compute_balance(db, user_id)
+    if balance < amount:
+        db.rollback()
+        return None
+
+    return _append_entry(db, user_id, -amount, kind, reference, description)
+
+def take_wallet_snapshot(db: Session, user_id: int) -> WalletSnapshot:
+    """
+    Records the current balance of a user's wallet as a new snapshot.
+    """
+    _lock_wallet(db, user_id)
+    balance, _, last_entry_id = _compute_balance(db, user_id)
+    snapshot = _write_snapshot(db, user_id, balance, last_entry_id)
+    db.commit()
+    db.refresh(snapshot)
+    return snapshot
@@ -8,6 +8,7 @@ from telegram.ext import (
     CallbackQueryHandler,
     ConversationHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
@@ -15,7 +16,13 @@ from core.config import settings
 from core.database import engine
 from models import user as user_model
 from models import panel as panel_model
+from models import wallet as wallet_model
+from models import purchase_job as purchase_job_model
+from services.purchase_worker import PurchaseWorkerPool
+from services.config_delivery import config_delivery
 
+from bot.rate_limiter import rate_limit_guard
+from bot.context_store import context_store, track_context_activity, sweep_context_data
 from bot.handlers.common_handlers import start
 from bot.handlers.user_handlers import user_button_handler
 from bot.handlers.admin_handlers import (
@@ -27,6 +34,11 @@ from bot.handlers.admin_handlers import (
     receive_panel_username,
     receive_panel_password_and_validate,
     cancel_conversation,
+    conversation_timeout,
+    memory_stats_command,
+    export_command,
+    credit_command,
+    rate_limit_command,
     PANEL_NAME,
     PANEL_TYPE,
     PANEL_URL,
@@ -37,14 +49,17 @@ from bot.handlers.admin_handlers import (
 # ===== CONFIGURATION & CONSTANTS =====
 user_model.Base.metadata.create_all(bind=engine)
 panel_model.Base.metadata.create_all(bind=engine)
+wallet_model.Base.metadata.create_all(bind=engine)
+purchase_job_model.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="V2Ray Sales Bot")
 ptb_app: Application | None = None
+purchase_workers: PurchaseWorkerPool | None = None
 
 # ===== CORE BUSINESS LOGIC =====
 async def setup_telegram_bot():
     """Initializes the Telegram bot application, runs post-init tasks, and sets the webhook."""
-    global ptb_app
+    global ptb_app, purchase_workers
     
     ptb_app = Application.builder().token(settings.TELEGRAM_BOT_TOKEN).build()
     await ptb_app.initialize()
@@ -58,27 +73,59 @@ async def setup_telegram_bot():
             PANEL_URL: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_panel_url)],
             PANEL_USERNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_panel_username)],
             PANEL_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_panel_password_and_validate)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, conversation_timeout)],
         },
         fallbacks=[CommandHandler('cancel', cancel_conversation)],
-        per_message=False
+        per_message=False,
+        conversation_timeout=settings.CONVERSATION_TIMEOUT_SECONDS,
     )
 
+    # --- Setup bounded user_data/chat_data ---
+    # Group -2 runs first, so activity is recorded even for updates the rate limiter drops.
+    context_store.attach(ptb_app)
+    ptb_app.add_handler(TypeHandler(Update, track_context_activity), group=-2)
+    ptb_app.job_queue.run_repeating(
+        sweep_context_data,
+        interval=settings.CONTEXT_DATA_SWEEP_INTERVAL_SECONDS,
+        first=settings.CONTEXT_DATA_SWEEP_INTERVAL_SECONDS,
+    )
+
+    # --- Setup anti-flood rate limiting ---
+    # Group -1 runs before every other handler, so dropped updates never reach the DB or panels.
+    ptb_app.add_handler(TypeHandler(Update, rate_limit_guard), group=-1)
+
     # Register handlers
     # IMPORTANT: ConversationHandler must be added BEFORE other handlers that might catch the same updates.
     ptb_app.add_handler(add_panel_conv_handler)
     
     ptb_app.add_handler(CommandHandler("start", start))
+    ptb_app.add_handler(CommandHandler("ratelimit", rate_limit_command))
+    ptb_app.add_handler(CommandHandler("memstats", memory_stats_command))
+    ptb_app.add_handler(CommandHandler("export", export_command))
+    ptb_app.add_handler(CommandHandler("credit", credit_command))
     
     ptb_app.add_handler(CallbackQueryHandler(admin_button_handler, pattern='^admin_.*$'))
     ptb_app.add_handler(CallbackQueryHandler(user_button_handler, pattern='^(?!admin_).*$'))
 
+    # Start the application so the job queue runs (conversation timeouts, context data sweeps)
+    await ptb_app.start()
+
+    # Start the background workers that process queued purchases
+    purchase_workers = PurchaseWorkerPool(ptb_app.bot)
+    await purchase_workers.start()
+
     webhook_url = f"{settings.WEBHOOK_URL}/telegram"
     await ptb_app.bot.set_webhook(url=webhook_url)
     print(f"Webhook has been set to {webhook_url}")
 
 async def shutdown_telegram_bot():
     """Shuts down the application and performs cleanup."""
+    if purchase_workers:
+        await purchase_workers.stop()
+    config_delivery.shutdown()
     if ptb_app:
+        if ptb_app.running:
+            await ptb_app.stop()
         await ptb_app.shutdown()
 
 @app.on_event("startup")
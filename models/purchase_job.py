@@ -0,0 +1,54 @@
+# ===== IMPORTS & DEPENDENCIES =====
+from sqlalchemy import BigInteger, Integer, String, Text, ForeignKey, Index, Enum as SAEnum
+from sqlalchemy.orm import Mapped, mapped_column
+from .user import Base
+import datetime
+import enum
+
+# ===== ENUMS & TYPES =====
+class PurchaseJobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+# ===== PURCHASE JOB MODEL =====
+class PurchaseJob(Base):
+    """
+    A queued request to charge a user and provision a client on a panel.
+    Jobs are enqueued by the webhook handlers and processed by background workers.
+    """
+    __tablename__ = "purchase_jobs"
+    __table_args__ = (
+        Index("ix_purchase_jobs_claim", "panel_id", "status", "next_run_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # Enqueueing the same key twice returns the existing job instead of creating a new one.
+    idempotency_key: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    panel_id: Mapped[int] = mapped_column(ForeignKey("v2ray_panels.id"), nullable=False)
+    inbound_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    price: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # Where to report the outcome of the job to the user.
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status_message_id: Mapped[int | None] = mapped_column(BigInteger)
+
+    status: Mapped[PurchaseJobStatus] = mapped_column(SAEnum(PurchaseJobStatus), default=PurchaseJobStatus.PENDING, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_run_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.utcnow, nullable=False)
+    locked_at: Mapped[datetime.datetime | None] = mapped_column()
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    # Filled in once the client has been created on the panel.
+    client_uuid: Mapped[str | None] = mapped_column(String(36))
+    client_email: Mapped[str | None] = mapped_column(String(100))
+    config_link: Mapped[str | None] = mapped_column(Text)
+
+    created_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.utcnow)
+    updated_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PurchaseJob(id={self.id}, key='{self.idempotency_key}', status='{self.status.value}', attempts={self.attempts})>"
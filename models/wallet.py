@@ -0,0 +1,57 @@
+# ===== IMPORTS & DEPENDENCIES =====
+from sqlalchemy import BigInteger, String, ForeignKey, Index, Enum as SAEnum, func
+from sqlalchemy.orm import Mapped, mapped_column
+from .user import Base
+import datetime
+import enum
+
+# ===== ENUMS & TYPES =====
+class WalletEntryKind(str, enum.Enum):
+    TOPUP = "topup"
+    PURCHASE = "purchase"
+    REFUND = "refund"
+    ADJUSTMENT = "adjustment"
+
+# ===== WALLET LEDGER MODEL =====
+class WalletEntry(Base):
+    """
+    A single, immutable movement of money in a user's wallet.
+    Rows are only ever inserted; a balance is the sum of a user's entries.
+    Credits are positive amounts and debits are negative amounts.
+    """
+    __tablename__ = "wallet_entries"
+    __table_args__ = (
+        Index("ix_wallet_entries_user_id_id", "user_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    amount: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    kind: Mapped[WalletEntryKind] = mapped_column(SAEnum(WalletEntryKind), nullable=False)
+
+    # Optional idempotency key (e.g. a payment or order ID) so the same
+    # operation can be retried without being applied twice.
+    reference: Mapped[str | None] = mapped_column(String(100), unique=True)
+    description: Mapped[str | None] = mapped_column(String(255))
+
+    created_at: Mapped[datetime.datetime] = mapped_column(server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<WalletEntry(id={self.id}, user_id={self.user_id}, amount={self.amount}, kind='{self.kind.value}')>"
+
+# ===== WALLET SNAPSHOT MODEL =====
+class WalletSnapshot(Base):
+    """
+    The balance of a user's wallet up to and including `last_entry_id`.
+    Reading a balance only needs to sum the entries written after the snapshot.
+    """
+    __tablename__ = "wallet_snapshots"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    balance: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    last_entry_id: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    updated_at: Mapped[datetime.datetime] = mapped_column(default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<WalletSnapshot(user_id={self.user_id}, balance={self.balance}, last_entry_id={self.last_entry_id})>"
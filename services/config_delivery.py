@@ -0,0 +1,160 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import qrcode
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+from core.config import settings
+
+# ===== QR RENDERING (runs in worker processes) =====
+def render_qr_png(content: str) -> bytes:
+    """Renders `content` as a QR code and returns the PNG bytes."""
+    image = qrcode.make(content, box_size=8, border=2)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# ===== CONFIG DELIVERY SERVICE =====
+class ConfigDeliveryService:
+    """
+    Sends config links to users as QR code images without blocking the event loop.
+
+    QR codes are rendered in a process pool and cached by the SHA-256 of the link,
+    first in an in-memory LRU and then on disk. Once an image has been uploaded,
+    its Telegram `file_id` is remembered, so showing the same config again needs
+    neither rendering nor a new upload.
+    """
+    def __init__(self, cache_dir: str = settings.QR_CACHE_DIR, memory_items: int = settings.QR_MEMORY_CACHE_ITEMS,
+                 max_workers: int = settings.QR_RENDER_WORKERS):
+        self.cache_dir = cache_dir
+        self.memory_items = memory_items
+        self.max_workers = max_workers
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._file_ids: Dict[str, str] = {}
+        self._rendering: Dict[str, asyncio.Future] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}{suffix}")
+
+    # --- Telegram file_id cache ---
+    async def _get_file_id(self, digest: str) -> Optional[str]:
+        file_id = self._file_ids.get(digest)
+        if file_id is None:
+            data = await asyncio.to_thread(self._read_file, self._disk_path(digest, ".fileid"))
+            file_id = data.decode("utf-8").strip() if data else None
+            if file_id:
+                self._file_ids[digest] = file_id
+        return file_id
+
+    async def _remember_file_id(self, digest: str, file_id: str):
+        self._file_ids[digest] = file_id
+        await asyncio.to_thread(self._write_file, self._disk_path(digest, ".fileid"), file_id.encode("utf-8"))
+
+    async def _forget_file_id(self, digest: str):
+        self._file_ids.pop(digest, None)
+        await asyncio.to_thread(self._remove_file, self._disk_path(digest, ".fileid"))
+
+    # --- PNG cache ---
+    def _remember_png(self, digest: str, png: bytes):
+        self._memory[digest] = png
+        self._memory.move_to_end(digest)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        # Write to a temporary file first so readers never see a partial image.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _remove_file(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _read_file(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def _render(self, digest: str, content: str) -> bytes:
+        if self._pool is None:
+            # The bot already runs threads here, and forking a threaded process can deadlock the child.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(self._pool, render_qr_png, content)
+        await asyncio.to_thread(self._write_file, self._disk_path(digest, ".png"), png)
+        return png
+
+    async def get_qr_png(self, content: str) -> bytes:
+        """Returns the QR code PNG for `content`, rendering it only on a cache miss."""
+        digest = self.content_hash(content)
+
+        png = self._memory.get(digest)
+        if png is not None:
+            self._memory.move_to_end(digest)
+            return png
+
+        png = await asyncio.to_thread(self._read_file, self._disk_path(digest, ".png"))
+        if png is None:
+            # Concurrent requests for the same link share one rendering.
+            future = self._rendering.get(digest)
+            if future is None:
+                future = asyncio.ensure_future(self._render(digest, content))
+                self._rendering[digest] = future
+                future.add_done_callback(lambda _: self._rendering.pop(digest, None))
+            png = await asyncio.shield(future)
+
+        self._remember_png(digest, png)
+        return png
+
+    async def send_config(self, bot: Bot, chat_id: int, link: str, caption: str, **kwargs) -> Message:
+        """Sends `link` as a QR code photo, reusing the Telegram upload when possible."""
+        digest = self.content_hash(link)
+        file_id = await self._get_file_id(digest)
+        if file_id:
+            try:
+                return await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption, **kwargs)
+            except BadRequest as e:
+                # Telegram no longer accepts this file_id; fall back to uploading the image again.
+                print(f"Cached file_id for config {digest[:12]} was rejected: {e}")
+                await self._forget_file_id(digest)
+
+        png = await self.get_qr_png(link)
+        message = await bot.send_photo(chat_id=chat_id, photo=png, caption=caption, **kwargs)
+        if message.photo:
+            await self._remember_file_id(digest, message.photo[-1].file_id)
+        return message
+
+
+# Create a single instance of the service to be used throughout the application
+config_delivery = ConfigDeliveryService()
@@ -0,0 +1,156 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import csv
+import datetime
+import enum
+import gzip
+import io
+import json
+import os
+import tempfile
+from typing import Any, Callable, Optional
+
+import httpx
+
+from core.config import settings
+from core.database import SessionLocal
+from models.panel import V2RayPanel
+from models.purchase_job import PurchaseJob
+from models.user import User
+from models.wallet import WalletEntry
+
+# ===== CONFIGURATION & CONSTANTS =====
+# Tables admins can export, and the columns that must never leave the database.
+EXPORTABLE_MODELS = {
+    "users": (User, set()),
+    "panels": (V2RayPanel, {"password"}),
+    "orders": (PurchaseJob, set()),
+    "wallet": (WalletEntry, set()),
+}
+EXPORT_FORMATS = ("csv", "jsonl")
+
+# ===== HELPER FUNCTIONS =====
+def _serialize(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+# ===== EXPORT =====
+def export_table(table: str, fmt: str, progress: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Streams every row of `table` into a gzip-compressed CSV or JSONL temporary file and returns its path.
+    Rows are fetched through a server-side cursor in chunks of EXPORT_CHUNK_SIZE, so memory use
+    stays constant regardless of the table size. `progress(done, total)` is called after each chunk.
+    This is blocking; run it in a worker thread. The caller is responsible for deleting the file.
+    """
+    if table not in EXPORTABLE_MODELS:
+        raise ValueError(f"Unknown table '{table}'.")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'.")
+
+    model, hidden_columns = EXPORTABLE_MODELS[table]
+    columns = [column for column in model.__table__.columns if column.name not in hidden_columns]
+    column_names = [column.name for column in columns]
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    fd, path = tempfile.mkstemp(prefix=f"{table}-", suffix=f".{fmt}.gz")
+    os.close(fd)
+
+    db = SessionLocal()
+    try:
+        total = db.query(model).count()
+        # Selecting plain columns instead of ORM objects keeps rows out of the identity map.
+        rows = db.query(*columns).order_by(model.id).yield_per(chunk_size)
+
+        with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f) if fmt == "csv" else None
+            if writer:
+                writer.writerow(column_names)
+
+            done = 0
+            for row in rows:
+                values = [_serialize(value) for value in row]
+                if writer:
+                    writer.writerow(values)
+                else:
+                    f.write(json.dumps(dict(zip(column_names, values)), ensure_ascii=False) + "\n")
+
+                done += 1
+                if progress and done % chunk_size == 0:
+                    progress(done, total)
+
+        if progress:
+            progress(done, total)
+        return path
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        db.close()
+
+
+# ===== UPLOAD =====
+class FileSlice(io.RawIOBase):
+    """
+    A read-only view of `length` bytes of a file starting at `offset`.
+    It lets an upload read one part of a large export in small chunks.
+    """
+    def __init__(self, path: str, offset: int, length: int):
+        self._file = open(path, "rb")
+        self._offset = offset
+        self._length = length
+        self._position = 0
+        self._file.seek(offset)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, position: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            position += self._position
+        elif whence == io.SEEK_END:
+            position += self._length
+        self._position = max(0, min(position, self._length))
+        self._file.seek(self._offset + self._position)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        remaining = self._length - self._position
+        if remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:remaining]
+        count = self._file.readinto(view)
+        self._position += count
+        return count
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+async def upload_export_part(chat_id: int, path: str, filename: str, offset: int, length: int) -> None:
+    """
+    Sends `length` bytes of `path` starting at `offset` as a Telegram document.
+    The Bot API is called directly so the file is streamed from disk in small chunks;
+    python-telegram-bot would first read the whole part into memory.
+    """
+    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendDocument"
+    timeout = httpx.Timeout(30.0, write=None)
+    with FileSlice(path, offset, length) as part:
+        async with httpx.AsyncClient(timeout=timeout) as client:
+            response = await client.post(
+                url,
+                data={"chat_id": str(chat_id)},
+                files={"document": (filename, part, "application/gzip")},
+            )
+    result = response.json() if response.text else {}
+    if response.status_code != 200 or not result.get("ok"):
+        raise RuntimeError(result.get("description") or f"Upload failed with status {response.status_code}")
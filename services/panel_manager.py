@@ -1,6 +1,8 @@
 # ===== IMPORTS & DEPENDENCIES =====
 import httpx
 import json
+import base64
+from urllib.parse import urlparse, quote
 from abc import ABC, abstractmethod
 from typing import Optional, List, Dict, Any
 
@@ -19,6 +21,19 @@ class BasePanelManager(ABC):
     @abstractmethod
     async def get_inbounds(self) -> List[Dict[str, Any]]:
         pass
+
+    @abstractmethod
+    async def add_client(self, inbound_id: int, client_uuid: str, email: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def client_exists(self, inbound_id: int, client_uuid: str, email: str) -> Optional[bool]:
+        """Returns True/False if the panel confirms whether the client exists, or None if it cannot tell."""
+        pass
+
+    @abstractmethod
+    async def get_client_link(self, inbound_id: int, client_uuid: str, email: str) -> Optional[str]:
+        pass
     
     async def __aenter__(self):
         headers = {
@@ -53,6 +68,46 @@ class MarzbanPanel(BasePanelManager):
         if not await self.login(): return []
         return [{"id": 1, "remark": "پلن پیش‌فرض مرزبان"}] 
 
+    async def add_client(self, inbound_id: int, client_uuid: str, email: str) -> bool:
+        if not await self.login(): return False
+        try:
+            api_url = self.api_url.rstrip('/')
+            payload = {"username": email, "proxies": {"vless": {"id": client_uuid}}, "inbounds": {}}
+            response = await self.session.post(f"{api_url}/api/user", json=payload)
+            if response.status_code == 409:
+                # The username is derived from the order, so it already belongs to this client
+                # (e.g. an earlier attempt succeeded but its response was lost).
+                return True
+            return response.status_code == 200
+        except Exception as e:
+            print(f"An exception occurred in add_client: {e}")
+            return False
+
+    async def client_exists(self, inbound_id: int, client_uuid: str, email: str) -> Optional[bool]:
+        if not await self.login(): return None
+        try:
+            api_url = self.api_url.rstrip('/')
+            response = await self.session.get(f"{api_url}/api/user/{email}")
+            if response.status_code == 404:
+                return False
+            return True if response.status_code == 200 else None
+        except Exception as e:
+            print(f"An exception occurred in client_exists: {e}")
+            return None
+
+    async def get_client_link(self, inbound_id: int, client_uuid: str, email: str) -> Optional[str]:
+        if not await self.login(): return None
+        try:
+            api_url = self.api_url.rstrip('/')
+            response = await self.session.get(f"{api_url}/api/user/{email}")
+            if response.status_code != 200:
+                return None
+            links = response.json().get("links") or []
+            return links[0] if links else None
+        except Exception as e:
+            print(f"An exception occurred in get_client_link: {e}")
+            return None
+
 
 # ===== SANAEI / ALIREZA (X-UI) PANEL MANAGER =====
 class SanaeiPanel(BasePanelManager):
@@ -114,6 +169,169 @@ class SanaeiPanel(BasePanelManager):
             print(f"An exception occurred in get_inbounds: {e}")
             return []
 
+    async def _get_inbound(self, inbound_id: int) -> Optional[Dict[str, Any]]:
+        base_url = self.api_url.rstrip('/')
+        response = await self.session.get(f"{base_url}/panel/api/inbounds/get/{inbound_id}")
+        if response.status_code != 200 or not response.text:
+            print(f"get_inbound failed with status {response.status_code}: {response.text[:200]}")
+            return None
+        response_data = response.json()
+        if not response_data.get("success"):
+            return None
+        return response_data.get("obj")
+
+    @staticmethod
+    def _client_flow(inbound: Dict[str, Any], stream: Dict[str, Any]) -> str:
+        # x-ui uses XTLS Vision for vless over raw TCP with tls/reality; other transports do not support a flow.
+        if inbound.get("protocol") == "vless" and stream.get("network", "tcp") == "tcp" \
+                and stream.get("security") in ("tls", "reality"):
+            return "xtls-rprx-vision"
+        return ""
+
+    @staticmethod
+    def _find_client(inbound: Dict[str, Any], client_uuid: str, email: str) -> Optional[Dict[str, Any]]:
+        clients = json.loads(inbound.get("settings") or "{}").get("clients") or []
+        for client in clients:
+            if client.get("id") == client_uuid or client.get("email") == email:
+                return client
+        return None
+
+    async def client_exists(self, inbound_id: int, client_uuid: str, email: str) -> Optional[bool]:
+        if not self.session or not await self.login():
+            return None
+
+        try:
+            inbound = await self._get_inbound(inbound_id)
+            if inbound is None:
+                return None
+            return self._find_client(inbound, client_uuid, email) is not None
+        except Exception as e:
+            print(f"An exception occurred in client_exists: {e}")
+            return None
+
+    async def add_client(self, inbound_id: int, client_uuid: str, email: str) -> bool:
+        if not self.session or not await self.login():
+            return False
+
+        try:
+            inbound = await self._get_inbound(inbound_id)
+            if not inbound:
+                return False
+            if self._find_client(inbound, client_uuid, email):
+                # An earlier attempt already created this client; adding it again would be rejected.
+                return True
+            stream = json.loads(inbound.get("streamSettings") or "{}")
+
+            base_url = self.api_url.rstrip('/')
+            client_settings = {
+                "clients": [{
+                    "id": client_uuid,
+                    "email": email,
+                    "enable": True,
+                    "flow": self._client_flow(inbound, stream),
+                    "limitIp": 0,
+                    "totalGB": 0,
+                    "expiryTime": 0,
+                    "tgId": "",
+                    "subId": "",
+                }]
+            }
+            data = {"id": inbound_id, "settings": json.dumps(client_settings)}
+            response = await self.session.post(f"{base_url}/panel/api/inbounds/addClient", data=data)
+            if response.status_code != 200 or not response.text:
+                print(f"add_client failed with status {response.status_code}: {response.text[:200]}")
+                return False
+            return bool(response.json().get("success"))
+        except Exception as e:
+            print(f"An exception occurred in add_client: {e}")
+            return False
+
+    @staticmethod
+    def _stream_params(stream: Dict[str, Any]) -> Dict[str, str]:
+        """Extracts the transport and security parameters a client needs from an inbound's streamSettings."""
+        network = stream.get("network", "tcp")
+        security = stream.get("security", "none")
+        params = {"type": network, "security": security}
+
+        if network == "ws":
+            ws = stream.get("wsSettings") or {}
+            params["path"] = ws.get("path", "")
+            params["host"] = ws.get("host") or (ws.get("headers") or {}).get("Host", "")
+        elif network == "grpc":
+            grpc = stream.get("grpcSettings") or {}
+            params["serviceName"] = grpc.get("serviceName", "")
+            if grpc.get("multiMode"):
+                params["mode"] = "multi"
+        elif network == "tcp":
+            header = (stream.get("tcpSettings") or {}).get("header") or {}
+            if header.get("type") == "http":
+                request = header.get("request") or {}
+                params["headerType"] = "http"
+                params["path"] = ",".join(request.get("path") or [])
+                params["host"] = ",".join((request.get("headers") or {}).get("Host") or [])
+
+        if security == "tls":
+            tls = stream.get("tlsSettings") or {}
+            params["sni"] = tls.get("serverName", "")
+            params["fp"] = (tls.get("settings") or {}).get("fingerprint", "")
+            params["alpn"] = ",".join(tls.get("alpn") or [])
+        elif security == "reality":
+            reality = stream.get("realitySettings") or {}
+            reality_client = reality.get("settings") or {}
+            params["sni"] = (reality.get("serverNames") or [""])[0]
+            params["fp"] = reality_client.get("fingerprint", "")
+            params["pbk"] = reality_client.get("publicKey", "")
+            params["sid"] = (reality.get("shortIds") or [""])[0]
+            params["spx"] = reality_client.get("spiderX", "")
+
+        return {key: value for key, value in params.items() if value}
+
+    async def get_client_link(self, inbound_id: int, client_uuid: str, email: str) -> Optional[str]:
+        if not self.session or not await self.login():
+            return None
+
+        try:
+            inbound = await self._get_inbound(inbound_id)
+            if not inbound:
+                return None
+
+            stream = json.loads(inbound.get("streamSettings") or "{}")
+            params = self._stream_params(stream)
+            host = urlparse(self.api_url).hostname
+            port = inbound.get("port")
+            remark = f"{inbound.get('remark', '')}-{email}"
+
+            if inbound.get("protocol") == "vless":
+                params["encryption"] = "none"
+                flow = self._client_flow(inbound, stream)
+                if flow:
+                    params["flow"] = flow
+                query = "&".join(f"{key}={quote(value, safe='')}" for key, value in params.items())
+                return f"vless://{client_uuid}@{host}:{port}?{query}#{quote(remark)}"
+
+            if inbound.get("protocol") == "vmess":
+                security = params.get("security", "none")
+                vmess_config = {
+                    "v": "2", "ps": remark, "add": host, "port": str(port), "id": client_uuid,
+                    "aid": "0", "scy": "auto", "net": params["type"],
+                    "type": params.get("headerType", "none"),
+                    "host": params.get("host", ""),
+                    # gRPC carries its service name in the path field of vmess links.
+                    "path": params.get("serviceName", "") if params["type"] == "grpc" else params.get("path", ""),
+                    "tls": security if security in ("tls", "reality") else "",
+                    "sni": params.get("sni", ""),
+                    "fp": params.get("fp", ""),
+                    "alpn": params.get("alpn", ""),
+                }
+                encoded = base64.b64encode(json.dumps(vmess_config).encode()).decode()
+                return f"vmess://{encoded}"
+
+            print(f"Unsupported protocol for config link: {inbound.get('protocol')}")
+            return None
+        except Exception as e:
+            print(f"An exception occurred in get_client_link: {e}")
+            return None
+
 
 # ===== FACTORY FUNCTION =====
 def get_panel_manager(panel_type: str, api_url: str, username: str, password: str) -> Optional[BasePanelManager]:
@@ -0,0 +1,275 @@
+# ===== IMPORTS & DEPENDENCIES =====
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+from telegram import Bot
+from telegram.error import TelegramError
+
+from core.config import settings
+from core.database import SessionLocal
+from crud import panel_crud, purchase_job_crud, wallet_crud
+from models.purchase_job import PurchaseJob, PurchaseJobStatus
+from models.user import User
+from models.wallet import WalletEntryKind
+from services.panel_manager import get_panel_manager
+
+# ===== HELPER FUNCTIONS =====
+def _client_uuid(job: PurchaseJob) -> str:
+    # Derived from the idempotency key so every retry targets the same client.
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, job.idempotency_key))
+
+def _client_email(job: PurchaseJob, user: User) -> str:
+    return f"tg{user.telegram_id}_{job.id}"
+
+
+# ===== DATABASE HELPERS (run in worker threads) =====
+def _load_panel_ids() -> List[int]:
+    db = SessionLocal()
+    try:
+        return [panel.id for panel in panel_crud.get_panels(db)]
+    finally:
+        db.close()
+
+def _claim_job(panel_id: int) -> Optional[PurchaseJob]:
+    db = SessionLocal()
+    try:
+        return purchase_job_crud.claim_next_job(db, panel_id=panel_id)
+    finally:
+        db.close()
+
+def _load_job_context(job: PurchaseJob):
+    db = SessionLocal()
+    try:
+        panel = db.get(panel_crud.V2RayPanel, job.panel_id)
+        user = db.get(User, job.user_id)
+        return panel, user
+    finally:
+        db.close()
+
+def _charge_wallet(job: PurchaseJob) -> bool:
+    """Debits the job's price once; retries of the same job reuse the first debit."""
+    if job.price <= 0:
+        # Never provision for free; jobs without a price are treated as unpaid.
+        return False
+    db = SessionLocal()
+    try:
+        entry = wallet_crud.debit_wallet(
+            db,
+            user_id=job.user_id,
+            amount=job.price,
+            kind=WalletEntryKind.PURCHASE,
+            reference=f"purchase:{job.idempotency_key}",
+            description=f"Purchase job #{job.id}",
+        )
+        return entry is not None
+    finally:
+        db.close()
+
+def _refund_wallet(job: PurchaseJob) -> None:
+    """Returns the job's price to the wallet if it was charged and not yet refunded."""
+    if job.price <= 0:
+        return
+    db = SessionLocal()
+    try:
+        if not wallet_crud.get_entry_by_reference(db, f"purchase:{job.idempotency_key}"):
+            return
+        wallet_crud.credit_wallet(
+            db,
+            user_id=job.user_id,
+            amount=job.price,
+            kind=WalletEntryKind.REFUND,
+            reference=f"refund:{job.idempotency_key}",
+            description=f"Refund for purchase job #{job.id}",
+        )
+    finally:
+        db.close()
+
+def _mark_succeeded(job_id: int, client_uuid: str, client_email: str, config_link: Optional[str]) -> PurchaseJob:
+    db = SessionLocal()
+    try:
+        job = db.get(PurchaseJob, job_id)
+        return purchase_job_crud.mark_job_succeeded(
+            db, job, client_uuid=client_uuid, client_email=client_email, config_link=config_link
+        )
+    finally:
+        db.close()
+
+def _mark_failed(job_id: int, error: str, retry: bool) -> PurchaseJob:
+    db = SessionLocal()
+    try:
+        job = db.get(PurchaseJob, job_id)
+        if job.status != PurchaseJobStatus.RUNNING:
+            # Already finished (e.g. failed for good before a later step raised); never reopen it.
+            return job
+        return purchase_job_crud.mark_job_failed(db, job, error=error, retry=retry)
+    finally:
+        db.close()
+
+
+# ===== PURCHASE WORKER POOL =====
+class PurchaseWorkerPool:
+    """
+    Processes queued purchase jobs in the background.
+    Each panel gets its own set of workers, so a slow panel only delays its own orders
+    and throughput grows with `workers_per_panel`.
+    """
+    def __init__(self, bot: Bot, workers_per_panel: int = settings.PURCHASE_WORKERS_PER_PANEL):
+        self.bot = bot
+        self.workers_per_panel = workers_per_panel
+        self._workers: Dict[int, List[asyncio.Task]] = {}
+        self._supervisor: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        tasks = [task for workers in self._workers.values() for task in workers]
+        if self._supervisor:
+            tasks.append(self._supervisor)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers.clear()
+
+    async def _supervise(self):
+        """Starts workers for every panel, including panels added while the bot is running."""
+        while True:
+            try:
+                panel_ids = await asyncio.to_thread(_load_panel_ids)
+                for panel_id in panel_ids:
+                    workers = self._workers.setdefault(panel_id, [])
+                    # Replace workers that have stopped, e.g. after an unexpected exception.
+                    for task in [task for task in workers if task.done()]:
+                        if not task.cancelled() and task.exception():
+                            print(f"Purchase worker for panel {panel_id} stopped: {task.exception()}")
+                        workers.remove(task)
+                    missing = self.workers_per_panel - len(workers)
+                    if missing > 0:
+                        workers.extend(asyncio.create_task(self._work(panel_id)) for _ in range(missing))
+                        print(f"Started {missing} purchase workers for panel {panel_id}.")
+            except Exception as e:
+                print(f"An exception occurred while supervising purchase workers: {e}")
+            await asyncio.sleep(settings.PURCHASE_PANEL_REFRESH_SECONDS)
+
+    async def _work(self, panel_id: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(_claim_job, panel_id)
+            except Exception as e:
+                print(f"An exception occurred while claiming a purchase job: {e}")
+                job = None
+
+            if not job:
+                await asyncio.sleep(settings.PURCHASE_JOB_POLL_INTERVAL)
+                continue
+
+            try:
+                await self._process(job)
+            except Exception as e:
+                print(f"Purchase job {job.id} failed: {e}")
+                try:
+                    failed_job = await asyncio.to_thread(_mark_failed, job.id, str(e), True)
+                    # A succeeded job stays succeeded; a failed one re-runs the idempotent refund/notice.
+                    if failed_job.status != PurchaseJobStatus.SUCCEEDED:
+                        await self._on_failure(failed_job)
+                except Exception as e:
+                    # The job's lease expires and it is claimed again once the database is reachable.
+                    print(f"Could not record the failure of purchase job {job.id}: {e}")
+                    await asyncio.sleep(settings.PURCHASE_JOB_POLL_INTERVAL)
+
+    async def _process(self, job: PurchaseJob):
+        panel, user = await asyncio.to_thread(_load_job_context, job)
+        if not panel or not user:
+            failed_job = await asyncio.to_thread(_mark_failed, job.id, "Panel or user no longer exists.", False)
+            await self._on_failure(failed_job)
+            return
+
+        if not await asyncio.to_thread(_charge_wallet, job):
+            await asyncio.to_thread(_mark_failed, job.id, "Insufficient wallet balance.", False)
+            await self._notify(job, "❌ موجودی کیف پول شما برای خرید این سرویس کافی نیست.")
+            return
+
+        client_uuid = _client_uuid(job)
+        client_email = _client_email(job, user)
+
+        manager = get_panel_manager(
+            panel_type=panel.panel_type.value,
+            api_url=panel.api_url,
+            username=panel.username,
+            password=panel.password,
+        )
+        if not manager:
+            failed_job = await asyncio.to_thread(_mark_failed, job.id, "No manager for this panel type.", False)
+            await self._on_failure(failed_job)
+            return
+
+        config_link = None
+        async with manager as m:
+            created = await m.add_client(job.inbound_id, client_uuid, client_email)
+            if created:
+                # Stored with the job so showing the config later needs no panel request.
+                config_link = await m.get_client_link(job.inbound_id, client_uuid, client_email)
+
+        if not created:
+            failed_job = await asyncio.to_thread(_mark_failed, job.id, "Panel rejected the new client.", True)
+            await self._on_failure(failed_job)
+            return
+
+        await asyncio.to_thread(_mark_succeeded, job.id, client_uuid, client_email, config_link)
+        await self._notify(
+            job,
+            "✅ سرویس شما با موفقیت ساخته شد.\n\n"
+            f"شناسه سرویس: {client_email}\n"
+            "برای دریافت کانفیگ به بخش «سرویس‌های من» مراجعه کنید."
+        )
+
+    async def _client_is_absent(self, job: PurchaseJob) -> bool:
+        """Returns True only if the panel confirms that this job's client was never created."""
+        panel, user = await asyncio.to_thread(_load_job_context, job)
+        if not panel or not user:
+            return False
+        manager = get_panel_manager(
+            panel_type=panel.panel_type.value,
+            api_url=panel.api_url,
+            username=panel.username,
+            password=panel.password,
+        )
+        if not manager:
+            return False
+        async with manager as m:
+            exists = await m.client_exists(job.inbound_id, _client_uuid(job), _client_email(job, user))
+        return exists is False
+
+    async def _on_failure(self, job: PurchaseJob):
+        """Refunds and informs the user once a job has failed for good; retries stay silent."""
+        if job.status != PurchaseJobStatus.FAILED:
+            print(f"Purchase job {job.id} will be retried at {job.next_run_at} (attempt {job.attempts}).")
+            return
+
+        if not await self._client_is_absent(job):
+            # The client may be working on the panel; leave the charge for an admin to review.
+            print(f"⚠️ Purchase job {job.id} failed but its client may exist on the panel; not refunding.")
+            await self._notify(
+                job,
+                "❌ در ساخت سرویس شما مشکلی پیش آمد.\n\n"
+                "لطفا با ذکر شماره سفارش "
+                f"{job.id} با پشتیبانی تماس بگیرید."
+            )
+            return
+
+        await asyncio.to_thread(_refund_wallet, job)
+        await self._notify(
+            job,
+            "❌ متاسفانه ساخت سرویس شما با خطا مواجه شد.\n\n"
+            "در صورت کسر وجه، مبلغ به کیف پول شما بازگردانده شد."
+        )
+
+    async def _notify(self, job: PurchaseJob, text: str):
+        try:
+            if job.status_message_id:
+                await self.bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.status_message_id)
+            else:
+                await self.bot.send_message(chat_id=job.chat_id, text=text)
+        except TelegramError as e:
+            print(f"Could not notify user about purchase job {job.id}: {e}")